@@ -1,18 +1,25 @@
 import asyncio
 import logging
-from datetime import datetime, timedelta
-import pytz
+import time
+from datetime import datetime, timedelta, timezone
 from typing import Optional
-from aiogram import Bot, Dispatcher, types
+import orjson
+import uvloop
+from aiogram import Bot, Dispatcher, F, types
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.filters import Command
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiolimiter import AsyncLimiter
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
 import os
 from dotenv import load_dotenv
 from bson import ObjectId
-from dateutil.parser import parse as parse_date
+
+UTC = timezone.utc
+REMINDER_LEAD = timedelta(minutes=5)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -25,12 +32,29 @@ if not BOT_TOKEN:
 MONGO_URI: str = os.getenv("MONGO_URI", "mongodb://localhost:27017")
 DB_NAME: str = os.getenv("DB_NAME", "event_reminder_bot")
 
-bot = Bot(token=BOT_TOKEN)
+bot = Bot(
+    token=BOT_TOKEN,
+    session=AiohttpSession(
+        json_loads=orjson.loads,
+        json_dumps=lambda obj: orjson.dumps(obj).decode()
+    )
+)
 dp = Dispatcher()
 
-mongo_client = AsyncIOMotorClient(MONGO_URI)
+mongo_client = AsyncIOMotorClient(
+    MONGO_URI, maxPoolSize=100, minPoolSize=10, compressors="zstd", tz_aware=True, tzinfo=UTC
+)
 db = mongo_client[DB_NAME]
 
+_wake = asyncio.Event()
+
+_global_limiter = AsyncLimiter(30, 1)
+_chat_limiters: dict[str, AsyncLimiter] = {}
+
+async def send_limited(chat_id: str, text: str, **kwargs) -> None:
+    async with _global_limiter, _chat_limiters.setdefault(chat_id, AsyncLimiter(1, 1)):
+        await bot.send_message(chat_id, text, **kwargs)
+
 class CreateEventForm(StatesGroup):
     title = State()
     description = State()
@@ -40,92 +64,101 @@ class CreateEventForm(StatesGroup):
 class CategoryForm(StatesGroup):
     add_category = State()
 
-def get_main_menu() -> ReplyKeyboardMarkup:
-    keyboard = ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="📅 Create Event"), KeyboardButton(text="🔔 Upcoming Events")],
-            [KeyboardButton(text="📊 Statistics"), KeyboardButton(text="📋 Categories")]
-        ],
-        resize_keyboard=True
-    )
-    return keyboard
+MAIN_MENU = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="📅 Create Event"), KeyboardButton(text="🔔 Upcoming Events")],
+        [KeyboardButton(text="📊 Statistics"), KeyboardButton(text="📋 Categories")]
+    ],
+    resize_keyboard=True
+)
+
+CATEGORY_KEYBOARD_TTL = 30.0
+_cat_cache: dict[str, tuple[float, InlineKeyboardMarkup]] = {}
 
 async def get_category_keyboard(user_id: str) -> InlineKeyboardMarkup:
-    categories = await db.categories.find({"user_id": user_id}).to_list(None)
+    cached = _cat_cache.get(user_id)
+    if cached and time.monotonic() - cached[0] < CATEGORY_KEYBOARD_TTL:
+        return cached[1]
+    categories = await db.categories.find({"user_id": user_id}, {"name": 1}).to_list(None)
     keyboard = InlineKeyboardMarkup(inline_keyboard=[
         [InlineKeyboardButton(text=cat["name"], callback_data=f"cat_{cat['_id']}")]
         for cat in categories
     ])
     keyboard.inline_keyboard.append([InlineKeyboardButton(text="➕ Add Category", callback_data="add_category")])
+    _cat_cache[user_id] = (time.monotonic(), keyboard)
     return keyboard
 
 async def register_user(user: types.User) -> None:
-    await db.users.update_one(
-        {"user_id": str(user.id)},
-        {
-            "$set": {
-                "username": user.username,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "created_at": datetime.now(pytz.UTC)
-            }
-        },
-        upsert=True
-    )
     default_categories = ["Work", "Personal", "Health", "Other"]
-    for cat in default_categories:
-        await db.categories.update_one(
+    ops = [
+        UpdateOne(
             {"user_id": str(user.id), "name": cat},
-            {"$set": {"name": cat}},
+            {"$setOnInsert": {"user_id": str(user.id), "name": cat}},
             upsert=True
         )
+        for cat in default_categories
+    ]
+    await asyncio.gather(
+        db.users.update_one(
+            {"user_id": str(user.id)},
+            {
+                "$set": {
+                    "username": user.username,
+                    "first_name": user.first_name,
+                    "last_name": user.last_name
+                },
+                "$setOnInsert": {
+                    "user_id": str(user.id),
+                    "created_at": datetime.now(UTC)
+                }
+            },
+            upsert=True
+        ),
+        db.categories.bulk_write(ops, ordered=False)
+    )
 
-async def create_event(user_id: str, title: str, description: str, date_time: datetime, category_id: str) -> ObjectId:
+async def create_event(user_id: str, title: str, description: str, date_time: datetime, category_id: ObjectId) -> ObjectId:
+    category = await db.categories.find_one({"_id": category_id}, {"name": 1})
     event = {
         "user_id": user_id,
         "title": title,
         "description": description,
         "date_time": date_time,
-        "category_id": ObjectId(category_id),
-        "created_at": datetime.now(pytz.UTC),
+        "category_id": category_id,
+        "category_name": category["name"] if category else "Unknown",
+        "created_at": datetime.now(UTC),
         "notified": False
     }
     result = await db.events.insert_one(event)
+    _wake.set()
     return result.inserted_id
 
 async def get_upcoming_events(user_id: str) -> list:
-    now = datetime.now(pytz.UTC)
+    now = datetime.now(UTC)
     events = await db.events.find({
         "user_id": user_id,
         "date_time": {"$gte": now},
         "notified": False
-    }).sort("date_time", 1).to_list(None)
+    }, {"title": 1, "description": 1, "date_time": 1, "category_name": 1}).sort("date_time", 1).limit(50).to_list(50)
     return events
 
 async def get_statistics(user_id: str) -> dict:
-    now = datetime.now(pytz.UTC)
+    now = datetime.now(UTC)
     start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
     
-    events_this_month = await db.events.count_documents({
-        "user_id": user_id,
-        "created_at": {"$gte": start_of_month}
-    })
-    
-    most_used_category = await db.events.aggregate([
-        {"$match": {"user_id": user_id}},
-        {"$group": {"_id": "$category_id", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 1},
-        {"$lookup": {
-            "from": "categories",
-            "localField": "_id",
-            "foreignField": "_id",
-            "as": "category"
-        }},
-        {"$unwind": "$category"}
-    ]).to_list(None)
-    
-    most_used = most_used_category[0]["category"]["name"] if most_used_category else "None"
+    events_this_month, most_used_category = await asyncio.gather(
+        db.events.count_documents({
+            "user_id": user_id,
+            "created_at": {"$gte": start_of_month}
+        }),
+        db.events.aggregate([
+            {"$match": {"user_id": user_id}},
+            {"$sortByCount": "$category_name"},
+            {"$limit": 1}
+        ]).to_list(1)
+    )
+
+    most_used = most_used_category[0]["_id"] if most_used_category else "None"
     most_used_count = most_used_category[0]["count"] if most_used_category else 0
     
     return {
@@ -134,34 +167,60 @@ async def get_statistics(user_id: str) -> dict:
         "most_used_count": most_used_count
     }
 
+async def _send_reminder(event: dict) -> Optional[ObjectId]:
+    user_id = event["user_id"]
+    try:
+        await send_limited(
+            user_id,
+            f"🔔 Reminder: *{event['title']}*\n"
+            f"Category: {event.get('category_name', 'Unknown')}\n"
+            f"Description: {event['description']}\n"
+            f"Time: {event['date_time'].strftime('%Y-%m-%d %H:%M')}",
+            parse_mode="Markdown"
+        )
+        return event["_id"]
+    except Exception as e:
+        logger.error(f"Failed to send reminder to {user_id}: {e}")
+        return None
+
 async def reminder_task() -> None:
     while True:
-        now = datetime.now(pytz.UTC)
-        events = await db.events.find({
-            "date_time": {"$lte": now + timedelta(minutes=5)},
-            "notified": False
-        }).to_list(None)
-        
-        for event in events:
-            user_id = event["user_id"]
-            category = await db.categories.find_one({"_id": event["category_id"]})
-            if category:
-                try:
-                    await bot.send_message(
-                        user_id,
-                        f"🔔 Reminder: *{event['title']}*\n"
-                        f"Category: {category['name']}\n"
-                        f"Description: {event['description']}\n"
-                        f"Time: {event['date_time'].strftime('%Y-%m-%d %H:%M')}",
-                        parse_mode="Markdown"
-                    )
-                    await db.events.update_one(
-                        {"_id": event["_id"]},
-                        {"$set": {"notified": True}}
-                    )
-                except Exception as e:
-                    logger.error(f"Failed to send reminder to {user_id}: {e}")
-        
+        try:
+            now = datetime.now(UTC)
+            events = await db.events.find({
+                "date_time": {"$lte": now + REMINDER_LEAD},
+                "notified": False
+            }, {"user_id": 1, "title": 1, "description": 1, "date_time": 1, "category_name": 1}).batch_size(500).to_list(None)
+
+            results = await asyncio.gather(*(_send_reminder(event) for event in events))
+            sent = [event_id for event_id in results if event_id is not None]
+            if sent:
+                await db.events.update_many(
+                    {"_id": {"$in": sent}},
+                    {"$set": {"notified": True}}
+                )
+
+            next_events = await db.events.find({
+                "notified": False
+            }, {"date_time": 1}).sort("date_time", 1).limit(1).to_list(1)
+            if next_events:
+                now = datetime.now(UTC)
+                delay = (next_events[0]["date_time"] - now).total_seconds() - REMINDER_LEAD.total_seconds()
+                if delay <= 0:
+                    delay = 60.0
+                else:
+                    delay = min(delay, 60.0)
+            else:
+                delay = 60.0
+        except Exception as e:
+            logger.error(f"Reminder tick failed: {e}")
+            delay = 60.0
+        try:
+            await asyncio.wait_for(_wake.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+        _wake.clear()
+
 
 @dp.message(Command("start"))
 async def start_command(message: types.Message, state: FSMContext) -> None:
@@ -169,20 +228,20 @@ async def start_command(message: types.Message, state: FSMContext) -> None:
     if not message.from_user:
         await message.answer("Error: User information not available.")
         return
-    await register_user(message.from_user)
-    await message.answer(
-        "Welcome to the Event Reminder Bot! 🎉\n"
-        "Manage your events and get timely reminders. What would you like to do?",
-        reply_markup=get_main_menu()
+    await asyncio.gather(
+        register_user(message.from_user),
+        message.answer(
+            "Welcome to the Event Reminder Bot! 🎉\n"
+            "Manage your events and get timely reminders. What would you like to do?",
+            reply_markup=MAIN_MENU
+        )
     )
 
-@dp.message(lambda message: message.text == "📅 Create Event")
 async def create_event_start(message: types.Message, state: FSMContext) -> None:
     await state.clear()
     await message.answer("Enter the event title:", reply_markup=types.ReplyKeyboardRemove())
     await state.set_state(CreateEventForm.title)
 
-@dp.message(lambda message: message.text == "🦁 Upcoming Events")
 async def upcoming_events(message: types.Message, state: FSMContext) -> None:
     await state.clear()
     if not message.from_user:
@@ -190,22 +249,19 @@ async def upcoming_events(message: types.Message, state: FSMContext) -> None:
         return
     events = await get_upcoming_events(str(message.from_user.id))
     if not events:
-        await message.answer("No upcoming events. Create one with 'Create Event'!", reply_markup=get_main_menu())
+        await message.answer("No upcoming events. Create one with 'Create Event'!", reply_markup=MAIN_MENU)
         return
 
-    response = "Upcoming Events:\n\n"
-    for event in events:
-        category = await db.categories.find_one({"_id": event["category_id"]})
-        if category:
-            response += (
-                f"📅 *{event['title']}*\n"
-                f"Category: {category['name']}\n"
-                f"Time: {event['date_time'].strftime('%Y-%m-%d %H:%M')}\n"
-                f"Description: {event['description']}\n\n"
-            )
-    await message.answer(response, parse_mode="Markdown", reply_markup=get_main_menu())
-
-@dp.message(lambda message: message.text == "📊 Statistics")
+    lines = [
+        f"📅 *{event['title']}*\n"
+        f"Category: {event.get('category_name', 'Unknown')}\n"
+        f"Time: {event['date_time']:%Y-%m-%d %H:%M}\n"
+        f"Description: {event['description']}"
+        for event in events
+    ]
+    response = "Upcoming Events:\n\n" + "\n\n".join(lines)
+    await message.answer(response, parse_mode="Markdown", reply_markup=MAIN_MENU)
+
 async def statistics(message: types.Message, state: FSMContext) -> None:
     await state.clear()
     if not message.from_user:
@@ -217,9 +273,8 @@ async def statistics(message: types.Message, state: FSMContext) -> None:
         f"Events created this month: {stats['events_this_month']}\n"
         f"Most used category: {stats['most_used_category']} ({stats['most_used_count']} events)"
     )
-    await message.answer(response, reply_markup=get_main_menu())
+    await message.answer(response, reply_markup=MAIN_MENU)
 
-@dp.message(lambda message: message.text == "📋 Categories")
 async def categories(message: types.Message, state: FSMContext) -> None:
     await state.clear()
     if not message.from_user:
@@ -228,6 +283,17 @@ async def categories(message: types.Message, state: FSMContext) -> None:
     keyboard = await get_category_keyboard(str(message.from_user.id))
     await message.answer("Select a category or add a new one:", reply_markup=keyboard)
 
+_MENU_HANDLERS = {
+    "📅 Create Event": create_event_start,
+    "🔔 Upcoming Events": upcoming_events,
+    "📊 Statistics": statistics,
+    "📋 Categories": categories,
+}
+
+@dp.message(F.text.in_(set(_MENU_HANDLERS)))
+async def menu_dispatch(message: types.Message, state: FSMContext) -> None:
+    await _MENU_HANDLERS[message.text](message, state)
+
 @dp.message(CreateEventForm.title)
 async def process_title(message: types.Message, state: FSMContext) -> None:
     if not message.text:
@@ -252,10 +318,14 @@ async def process_date_time(message: types.Message, state: FSMContext) -> None:
         await message.answer("Date and time cannot be empty. Use YYYY-MM-DD HH:MM (e.g., 2025-06-15 14:30):")
         return
     try:
-        date_time = parse_date(message.text)
-        if date_time.tzinfo is None:
-            date_time = pytz.UTC.localize(date_time)
-        if date_time < datetime.now(pytz.UTC):
+        try:
+            date_time = datetime.strptime(message.text.strip(), "%Y-%m-%d %H:%M").replace(tzinfo=UTC)
+        except ValueError:
+            from dateutil.parser import parse as parse_date
+            date_time = parse_date(message.text)
+            if date_time.tzinfo is None:
+                date_time = date_time.replace(tzinfo=UTC)
+        if date_time < datetime.now(UTC):
             await message.answer("Please enter a future date and time:")
             return
         await state.update_data(date_time=date_time)
@@ -269,14 +339,15 @@ async def process_date_time(message: types.Message, state: FSMContext) -> None:
     except ValueError:
         await message.answer("Invalid date format. Use YYYY-MM-DD HH:MM (e.g., 2025-06-15 14:30):")
 
-@dp.callback_query(lambda c: c.data and c.data.startswith("cat_"), CreateEventForm.category)
+@dp.callback_query(F.data.startswith("cat_"), CreateEventForm.category)
 async def process_category(callback: types.CallbackQuery, state: FSMContext) -> None:
     if not callback.data or not callback.from_user or not callback.message:
         await callback.answer("Error: Invalid callback data.")
         return
-    category_id = callback.data.split("_")[1]
     data = await state.get_data()
+    await callback.answer()
     try:
+        category_id = ObjectId(callback.data[4:])
         event_id = await create_event(
             str(callback.from_user.id),
             data["title"],
@@ -286,16 +357,15 @@ async def process_category(callback: types.CallbackQuery, state: FSMContext) ->
         )
         await callback.message.answer(
             f"Event '{data['title']}' created successfully! You'll be reminded at the set time.",
-            reply_markup=get_main_menu()
+            reply_markup=MAIN_MENU
         )
         await state.clear()
     except Exception as e:
         logger.error(f"Error creating event: {e}")
-        await callback.message.answer("Failed to create event. Please try again.", reply_markup=get_main_menu())
+        await callback.message.answer("Failed to create event. Please try again.", reply_markup=MAIN_MENU)
         await state.clear()
-    await callback.answer()
 
-@dp.callback_query(lambda c: c.data == "add_category")
+@dp.callback_query(F.data == "add_category")
 async def add_category_start(callback: types.CallbackQuery, state: FSMContext) -> None:
     if not callback.message:
         await callback.answer("Error: Message not available.")
@@ -321,18 +391,29 @@ async def process_category_name(message: types.Message, state: FSMContext) -> No
         await db.categories.insert_one({
             "user_id": str(message.from_user.id),
             "name": category_name,
-            "created_at": datetime.now(pytz.UTC)
+            "created_at": datetime.now(UTC)
         })
-        await message.answer("Category added successfully!", reply_markup=get_main_menu())
+        _cat_cache.pop(str(message.from_user.id), None)
+        await message.answer("Category added successfully!", reply_markup=MAIN_MENU)
         await state.clear()
     except Exception as e:
         logger.error(f"Error adding category: {e}")
-        await message.answer("Failed to add category. Please try again.", reply_markup=get_main_menu())
+        await message.answer("Failed to add category. Please try again.", reply_markup=MAIN_MENU)
         await state.clear()
 
+async def ensure_indexes() -> None:
+    await db.events.create_index([("user_id", 1), ("date_time", 1), ("notified", 1)])
+    await db.events.create_index([("notified", 1), ("date_time", 1)])
+    await db.events.create_index([("user_id", 1), ("created_at", 1)])
+    await db.events.create_index([("user_id", 1), ("category_name", 1)])
+    await db.categories.create_index([("user_id", 1)])
+    await db.categories.create_index([("user_id", 1), ("name", 1)], unique=True)
+    await db.users.create_index([("user_id", 1)], unique=True)
+
 async def main() -> None:
+    await ensure_indexes()
     asyncio.create_task(reminder_task())
-    
+
     try:
         await dp.start_polling(bot)
     finally:
@@ -340,4 +421,5 @@ async def main() -> None:
         mongo_client.close()
 
 if __name__ == "__main__":
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
     asyncio.run(main())
\ No newline at end of file